@@ -0,0 +1,134 @@
+import geopandas as gpd
+import pandas as pd
+import numpy as np
+import os
+import re
+
+# Low-cardinality name columns (~36 states, one group/type). join_key, dist_name and shapeName
+# are close to unique per district, so categoricals would only add integer codes on top.
+CATEGORICAL_COLUMNS = ['state_name', 'shapeGroup', 'shapeType']
+
+YEAR_COLUMN = re.compile(r'^pop_(\d{4})$')
+DENSITY_COLUMN = re.compile(r'^density_(\d{4})$')
+
+
+def memory_footprint(frame):
+    """Deep memory usage of a (Geo)DataFrame in bytes, counting geometries by their WKB size."""
+    usage = frame.memory_usage(deep=True, index=True)
+    return int(usage.sum() - usage[frame.geometry.name]) + geometry_footprint(frame.geometry)
+
+
+def geometry_footprint(geometry):
+    return int(geometry.to_wkb().map(len).sum())
+
+
+def process_memory():
+    """Resident set size of this process in bytes, or None where /proc is not available."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def report_footprint(before, after):
+    saved = (1 - after / before) * 100 if before else 0
+    print(f"Master table footprint (columns + WKB geometry): {before / 1e6:,.1f} MB -> {after / 1e6:,.1f} MB ({saved:.1f}% smaller)")
+
+
+def report_process_memory(label):
+    rss = process_memory()
+    if rss is not None:
+        print(f"Process resident memory {label}: {rss / 1e6:,.1f} MB")
+
+
+class CompactMaster:
+    """
+    Compact stand-in for the joined master GeoDataFrame.
+
+    Yearly populations live in one C-contiguous float32 array of shape (years, districts),
+    so each `pop_YYYY` column is a zero-copy row view. Densities are never stored; they are
+    computed from that view when asked for. float32 keeps ~7 significant digits, so values
+    read back from the block differ from the float64 pipeline in the last places.
+    """
+
+    def __init__(self, attrs, years, pops, geometry, column_order):
+        self.attrs = attrs
+        self.years = years
+        self.pops = pops
+        self.geometry = geometry
+        self.geom_name = geometry.name
+        self.column_order = column_order
+        self._year_index = {year: i for i, year in enumerate(years)}
+
+    @classmethod
+    def from_frame(cls, master, simplify_tolerance=None):
+        year_cols = [c for c in master.columns if YEAR_COLUMN.match(c)]
+        years = [YEAR_COLUMN.match(c).group(1) for c in year_cols]
+        pops = np.ascontiguousarray(master[year_cols].to_numpy(dtype=np.float32).T)
+
+        # Stored densities are derived data; drop them and recompute on demand.
+        densities = {c for c in master.columns if DENSITY_COLUMN.match(c)}
+        column_order = [c for c in master.columns if c not in densities]
+        skip = set(year_cols) | densities | {master.geometry.name}
+        attrs = pd.DataFrame({c: master[c] for c in master.columns if c not in skip}, index=master.index)
+        for col in CATEGORICAL_COLUMNS:
+            if col in attrs.columns:
+                attrs[col] = attrs[col].astype('category')
+
+        geometry = master.geometry
+        if simplify_tolerance is not None:
+            # simplify() drops the series name, which select() needs to rebuild the geometry column
+            geometry = geometry.simplify(simplify_tolerance, preserve_topology=True).rename(master.geometry.name)
+        return cls(attrs, years, pops, geometry, column_order)
+
+    def __len__(self):
+        return len(self.attrs)
+
+    @property
+    def crs(self):
+        return self.geometry.crs
+
+    @property
+    def columns(self):
+        """Column names in the order of the frame this was built from, geometry included."""
+        return list(self.column_order)
+
+    def pop(self, year):
+        return self.pops[self._year_index[str(year)]]
+
+    def density(self, year):
+        return self.pop(year) / self.attrs['area_km2'].to_numpy()
+
+    def __getitem__(self, name):
+        match = YEAR_COLUMN.match(name)
+        if match:
+            return pd.Series(self.pop(match.group(1)), index=self.attrs.index, name=name, copy=False)
+        match = DENSITY_COLUMN.match(name)
+        if match:
+            return pd.Series(self.density(match.group(1)), index=self.attrs.index, name=name, copy=False)
+        return self.attrs[name]
+
+    def select(self, columns, upcast=False):
+        """
+        GeoDataFrame of the requested columns (including pop_/density_ names) in the given order.
+
+        Stored arrays are not copied unless `upcast` is set, which converts the float32 year and
+        density columns to float64 so exports keep the default pipeline's schema.
+        """
+        geom_name = self.geom_name
+        data = {}
+        for c in columns:
+            if c == geom_name:
+                data[c] = self.geometry
+            else:
+                col = self[c]
+                if upcast and col.dtype == np.float32:
+                    col = col.astype(np.float64)
+                data[c] = col
+        if geom_name not in data:
+            data[geom_name] = self.geometry
+        return gpd.GeoDataFrame(data, index=self.attrs.index, geometry=geom_name, crs=self.crs, copy=False)
+
+    def memory_footprint(self):
+        return int(self.attrs.memory_usage(deep=True).sum()) + self.pops.nbytes + geometry_footprint(self.geometry)
@@ -0,0 +1,323 @@
+import geopandas as gpd
+import matplotlib
+matplotlib.use('Agg')
+from matplotlib.figure import Figure
+from matplotlib.colors import LogNorm, Normalize
+import os
+import io
+import json
+import math
+import asyncio
+import argparse
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlsplit, parse_qs
+from projection_loader import YEARS, load_master
+from compact_master import CompactMaster
+
+# metric -> (default colormap, normalisation, colorbar label)
+METRICS = {
+    'density': ('magma', lambda: LogNorm(vmin=100, vmax=15000), "Projected People per km²"),
+    'pop': ('viridis', lambda: LogNorm(vmin=1e5, vmax=1e7), "Projected Population"),
+    'growth': ('RdYlGn_r', lambda: Normalize(vmin=-0.5, vmax=2.5), "Annualized Growth Rate since 2011 (%)"),
+}
+
+MAX_PIXELS = 2400
+MIN_PIXELS = 64
+RENDER_DPI = 100
+
+
+class BadRequest(ValueError):
+    pass
+
+
+def build_master(compact=False, simplify_tolerance=None):
+    """Joined master frame and national totals; the full frame also gets a density column for every year."""
+    master, national_totals = load_master(compact=compact, simplify_tolerance=simplify_tolerance)
+    if not compact:
+        for year in YEARS:
+            master[f'density_{year}'] = master[f'pop_{year}'] / master['area_km2']
+    return master, national_totals
+
+
+# --- Rendering (runs inside worker processes) ---
+
+_MASTER = None
+
+
+def _init_worker(master):
+    global _MASTER
+    _MASTER = master
+
+
+def _noop():
+    pass
+
+
+def render_map(year, metric, bbox, width, height, cmap):
+    """Render one choropleth to PNG bytes. Uses the OO Figure API so no pyplot state is shared."""
+    master = _MASTER
+    if metric == 'growth':
+        span = int(year) - 2011
+        values = ((master[f'pop_{year}'] / master['pop_2011'])**(1/span) - 1) * 100
+    else:
+        values = master[f'{metric}_{year}']
+    frame = gpd.GeoDataFrame({'value': values}, geometry=master.geometry, crs=master.crs)
+    if bbox is not None:
+        minx, miny, maxx, maxy = bbox
+        frame = frame.cx[minx:maxx, miny:maxy]
+
+    _, norm_factory, label = METRICS[metric]
+    fig = Figure(figsize=(width / RENDER_DPI, height / RENDER_DPI), dpi=RENDER_DPI, facecolor='white')
+    ax = fig.add_subplot(1, 1, 1)
+    if len(frame):
+        frame.plot(column='value', ax=ax, cmap=cmap, norm=norm_factory(),
+                   legend=True,
+                   legend_kwds={'label': label, 'orientation': "horizontal", 'pad': 0.02, 'shrink': 0.6},
+                   missing_kwds={'color': '#e9ecef'},
+                   edgecolor='black', linewidth=0.05)
+    if bbox is not None:
+        ax.set_xlim(bbox[0], bbox[2])
+        ax.set_ylim(bbox[1], bbox[3])
+    ax.set_title(f"India {metric.capitalize()}: {year}", fontsize=14, fontweight='bold')
+    ax.axis('off')
+
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png', dpi=RENDER_DPI)
+    return buf.getvalue()
+
+
+# --- Caching ---
+
+class PNGCache:
+    """Size-bounded LRU of rendered images keyed by normalised request parameters."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        png = self._entries.get(key)
+        if png is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return png
+
+    def put(self, key, png):
+        if len(png) > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.size -= len(old)
+        self._entries[key] = png
+        self.size += len(png)
+        while self.size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= len(evicted)
+
+    def stats(self):
+        return {'entries': len(self._entries), 'bytes': self.size, 'max_bytes': self.max_bytes,
+                'hits': self.hits, 'misses': self.misses}
+
+
+# --- Request parsing ---
+
+def _single(query, name, default=None):
+    values = query.get(name)
+    return values[-1] if values else default
+
+
+def _parse_year(query):
+    year = _single(query, 'year', '2025')
+    if year not in YEARS:
+        raise BadRequest(f"year must be between {YEARS[0]} and {YEARS[-1]}")
+    return year
+
+
+def _parse_bbox(query):
+    raw = _single(query, 'bbox')
+    if raw is None:
+        return None
+    try:
+        bbox = tuple(round(float(v), 4) for v in raw.split(','))
+    except ValueError:
+        raise BadRequest("bbox must be minx,miny,maxx,maxy")
+    if len(bbox) != 4 or not all(math.isfinite(v) for v in bbox) or bbox[0] >= bbox[2] or bbox[1] >= bbox[3]:
+        raise BadRequest("bbox must be minx,miny,maxx,maxy")
+    return bbox
+
+
+def _parse_pixels(query, name, default):
+    try:
+        value = int(_single(query, name, default))
+    except ValueError:
+        raise BadRequest(f"{name} must be an integer")
+    return max(MIN_PIXELS, min(MAX_PIXELS, value))
+
+
+def parse_map_request(query):
+    year = _parse_year(query)
+    metric = _single(query, 'metric', 'density')
+    if metric not in METRICS:
+        raise BadRequest(f"metric must be one of {sorted(METRICS)}")
+    if metric == 'growth' and year == YEARS[0]:
+        raise BadRequest("growth needs a year after 2011")
+    cmap = _single(query, 'cmap', METRICS[metric][0])
+    if cmap not in matplotlib.colormaps:
+        raise BadRequest(f"unknown colormap: {cmap}")
+    return (year, metric, _parse_bbox(query),
+            _parse_pixels(query, 'width', 800), _parse_pixels(query, 'height', 960), cmap)
+
+
+# --- Server ---
+
+class MapServer:
+    def __init__(self, master, national_totals, workers, cache_bytes):
+        self.master = master
+        # Same pre-join series as the analyzer's national trend plot
+        self.national_totals = national_totals
+        self.workers = workers
+        self.cache = PNGCache(cache_bytes)
+        # Spawned (not forked) workers never inherit the listening or client sockets.
+        self.pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(master,),
+                                        mp_context=multiprocessing.get_context('spawn'))
+        self._inflight = {}
+
+    async def start_workers(self):
+        """Bring every worker up (and unpickle the master frame) before the first request arrives."""
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*[loop.run_in_executor(self.pool, _noop) for _ in range(self.workers)])
+
+    async def render(self, key):
+        png = self.cache.get(key)
+        if png is not None:
+            return png
+        # Identical concurrent requests share one render. Every caller awaits it shielded,
+        # so a disconnecting client never cancels the render the others are waiting on.
+        task = self._inflight.get(key)
+        if task is None:
+            loop = asyncio.get_running_loop()
+            task = asyncio.ensure_future(loop.run_in_executor(self.pool, render_map, *key))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._finish_render(key, t))
+        return await asyncio.shield(task)
+
+    def _finish_render(self, key, task):
+        del self._inflight[key]
+        if not task.cancelled() and task.exception() is None:
+            self.cache.put(key, task.result())
+
+    def query(self, query):
+        year = _parse_year(query)
+        columns = ['shapeName', 'state_name', 'area_km2', f'pop_{year}', f'density_{year}']
+        if isinstance(self.master, CompactMaster):
+            frame = self.master.select(columns)
+        else:
+            frame = self.master[columns + ['geometry']]
+        state = _single(query, 'state')
+        if state is not None:
+            frame = frame[frame['state_name'].str.upper() == state.strip().upper()]
+        district = _single(query, 'district')
+        if district is not None:
+            frame = frame[frame['shapeName'].str.upper() == district.strip().upper()]
+        bbox = _parse_bbox(query)
+        if bbox is not None:
+            minx, miny, maxx, maxy = bbox
+            frame = frame.cx[minx:maxx, miny:maxy]
+        out = frame[columns].rename(columns={f'pop_{year}': 'pop', f'density_{year}': 'density'})
+        return {'year': year, 'count': len(out),
+                'districts': json.loads(out.to_json(orient='records'))}
+
+    async def dispatch(self, path, query):
+        if path == '/map.png':
+            return 'image/png', await self.render(parse_map_request(query))
+        if path == '/query':
+            body = self.query(query)
+        elif path == '/national':
+            body = self.national_totals
+        elif path == '/years':
+            body = {'years': YEARS, 'metrics': sorted(METRICS)}
+        elif path == '/stats':
+            body = self.cache.stats()
+        else:
+            return None
+        return 'application/json', json.dumps(body).encode('utf-8')
+
+    async def handle(self, reader, writer):
+        try:
+            request_line = await reader.readline()
+            # Drain headers; nothing in them changes the response.
+            while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                pass
+            parts = request_line.decode('latin-1').split()
+            if len(parts) < 2 or parts[0] != 'GET':
+                await self._respond(writer, 405, 'application/json', b'{"error": "only GET is supported"}')
+                return
+            url = urlsplit(parts[1])
+            try:
+                result = await self.dispatch(url.path, parse_qs(url.query))
+            except BadRequest as e:
+                await self._respond(writer, 400, 'application/json', json.dumps({'error': str(e)}).encode('utf-8'))
+                return
+            if result is None:
+                await self._respond(writer, 404, 'application/json', b'{"error": "not found"}')
+                return
+            await self._respond(writer, 200, *result)
+        except Exception as e:
+            print(f"Error handling request: {e}")
+            await self._respond(writer, 500, 'application/json', b'{"error": "internal error"}')
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _respond(writer, status, content_type, body):
+        reasons = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 500: 'Internal Server Error'}
+        head = (f"HTTP/1.1 {status} {reasons[status]}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                "Connection: close\r\n\r\n")
+        writer.write(head.encode('latin-1') + body)
+        await writer.drain()
+
+
+async def serve(host, port, workers, cache_mb, compact=False, simplify_tolerance=None):
+    print("--- Loading master projection frame ---")
+    master, national_totals = build_master(compact, simplify_tolerance)
+    server = MapServer(master, national_totals, workers, cache_mb * 1024 * 1024)
+    try:
+        print(f"Starting {workers} render workers...")
+        await server.start_workers()
+        srv = await asyncio.start_server(server.handle, host, port)
+        print(f"Serving on http://{host}:{port} (workers={workers}, cache={cache_mb}MB)")
+        print("Endpoints: /map.png?year=&metric=&bbox=&width=&height=&cmap=  /query?year=&state=&district=&bbox=  /national  /years  /stats")
+        async with srv:
+            await srv.serve_forever()
+    finally:
+        server.pool.shutdown(cancel_futures=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local map/query server for the 2011-2036 district projections.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--workers', type=int, default=max(1, (os.cpu_count() or 2) - 1))
+    parser.add_argument('--cache-mb', type=int, default=256)
+    parser.add_argument('--compact', action='store_true', help="Hold the compact master table (categorical state/group columns, float32 year block).")
+    parser.add_argument('--simplify', type=float, default=None, help="Geometry simplification tolerance in degrees (compact mode only).")
+    args = parser.parse_args()
+    if args.simplify is not None and not args.compact:
+        parser.error("--simplify requires --compact")
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers, args.cache_mb, args.compact, args.simplify))
+    except KeyboardInterrupt:
+        print("\nServer stopped.")
+
+
+if __name__ == "__main__":
+    main()
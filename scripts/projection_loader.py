@@ -0,0 +1,84 @@
+import geopandas as gpd
+import pandas as pd
+import os
+import json
+import numpy as np
+from compact_master import CompactMaster, memory_footprint, report_footprint, report_process_memory
+
+YEARS = [str(2011 + i) for i in range(26)]
+
+
+def load_master(compact=False, simplify_tolerance=None):
+    """
+    Load boundaries, IPI weights and MoHFW projections and join them into the master frame.
+
+    Returns the joined GeoDataFrame (one pop_YYYY column per year, 2011-2036) and the
+    national total per year, summed over all disaggregated districts before the spatial join.
+    With `compact` the frame is returned as a CompactMaster instead; the intermediates are
+    released first so the full-size frame is the only large object alive while it is built.
+    """
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    data_dir = os.path.join(project_root, "data", "raw")
+
+    # 1. Load Spatial Data & Calculate Area
+    geojson_path = os.path.join(data_dir, "india_districts.geojson")
+    with open(geojson_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    gdf = gpd.GeoDataFrame.from_features(data['features'])
+    del data
+    if gdf.crs is None: gdf.set_crs(epsg=4326, inplace=True)
+    gdf['area_km2'] = gdf.to_crs(epsg=3857).geometry.area / 1e6
+
+    # 2. Get 2021 District Population Weights Mapping to States
+    ipi_path = os.path.join(data_dir, "IPI_District_Data.xlsx")
+    xl = pd.ExcelFile(ipi_path)
+    labels_df = xl.parse('Label Dictionary')
+
+    dist_map = labels_df.iloc[1:].set_index('District ID')['Unnamed: 1'].to_dict()
+    state_map = labels_df.iloc[1:].set_index('District ID')['Unnamed: 3'].to_dict()
+
+    dist_data = xl.parse('Indicator-District Data')
+    ind10 = dist_data[dist_data['Indicator ID'] == 10].copy()
+    ind10['dist_name'] = ind10['District ID'].map(dist_map)
+    ind10['state_name'] = ind10['District ID'].map(state_map)
+    ind10['pop_base'] = (ind10['Headcount 2021'] / (ind10['Prevalence 2021'] / 100)).replace([np.inf, -np.inf], np.nan)
+
+    weights_df = ind10[['dist_name', 'state_name', 'pop_base']].dropna()
+    state_totals = weights_df.groupby('state_name')['pop_base'].transform('sum')
+    weights_df['weight'] = weights_df['pop_base'] / state_totals
+    del xl, labels_df, dist_data, ind10, state_totals
+
+    # 3. Load State-level Projections
+    proj_path = os.path.join(data_dir, "india_projections_2011_2036_total.csv")
+    proj_df = pd.read_csv(proj_path, skiprows=1)
+    proj_df = proj_df[proj_df.iloc[:, 1].astype(str).str.strip().str.upper() == 'PERSON']
+
+    # Yearly columns range: Unnamed: 2 (2011) to Unnamed: 27 (2036)
+    year_cols = {year: f'Unnamed: {2+i}' for i, year in enumerate(YEARS)}
+
+    def normalize(name):
+        return str(name).upper().replace(' ', '').replace('-', '').replace('.', '')
+
+    proj_df['state_key'] = proj_df.iloc[:, 0].apply(normalize)
+    weights_df['state_key'] = weights_df['state_name'].apply(normalize)
+
+    # 4. Disaggregate for all years
+    dist_projections = weights_df.copy()
+    for year, col in year_cols.items():
+        state_vals = proj_df.set_index('state_key')[col].apply(lambda x: float(str(x).replace(',', '')) * 1000 if pd.notna(x) else np.nan)
+        dist_projections[f'pop_{year}'] = dist_projections.apply(lambda row: state_vals.get(row['state_key'], np.nan) * row['weight'], axis=1)
+    national_totals = {year: float(dist_projections[f'pop_{year}'].sum()) for year in YEARS}
+
+    # 5. Join to Geodataframe
+    gdf['join_key'] = gdf['shapeName'].apply(normalize)
+    dist_projections['join_key'] = dist_projections['dist_name'].apply(normalize)
+    master = gdf.merge(dist_projections.drop(columns=['state_key']), on='join_key', how='left')
+    del gdf, weights_df, dist_projections, proj_df
+
+    if compact:
+        report_process_memory("before compaction")
+        before = memory_footprint(master)
+        master = CompactMaster.from_frame(master, simplify_tolerance=simplify_tolerance)
+        report_footprint(before, master.memory_footprint())
+        report_process_memory("after compaction")
+    return master, national_totals